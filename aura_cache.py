@@ -0,0 +1,40 @@
+import marshal
+import os
+import threading
+
+# Reads the dictionary saved by write_cache at path
+# returns None when the file is missing, unreadable or of another version
+def read_cache(path, version):
+    try:
+        # a single read, marshal.load reads the file in small pieces
+        with open(path, 'rb') as f:
+            values = marshal.loads(f.read())
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(values, dict) or values.get('version') != version:
+        return None
+
+    return values
+
+# Writes the dictionary values with version to path, replacing the previous
+# file at once, each thread writes its own temporary file
+# returns whether the file was written, the caches only save work
+# so an unwritable cache folder is not an error
+def write_cache(path, version, values):
+    data = marshal.dumps(dict(values, version=version))
+
+    temp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp_path)
+        except (IOError, OSError):
+            pass
+        return False
+
+    return True
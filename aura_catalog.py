@@ -0,0 +1,160 @@
+import hashlib
+import mmap
+import struct
+import sys
+from LightningComponentsCompletions.aura_snippets import make_completion, make_attribute_completion
+
+# Binary catalog layout, all integers little endian
+#   header         magic, version, string count, tag count, attribute count
+#   string offsets string count + 1 offsets into the string data
+#   tags           per tag: name, first attribute, attribute count, required count,
+#                  completion trigger, completion contents
+#   attributes     parallel arrays of attribute names, types, completion triggers
+#                  and completion contents
+#   string data    utf-8 encoded strings
+# every tag's required attributes come first in its attribute range
+# the completions are the rendered snippets of aura_snippets
+MAGIC = b'AURC'
+VERSION = 2
+HEADER = struct.Struct('<4sIIII')
+TAG = struct.Struct('<IIHHII')
+
+class Catalog(object):
+
+    # Constructor
+    # Reads the header and tag names from buffer, a bytes like object or mmap
+    # attributes are decoded on first access of their tag
+    def __init__(self, buffer):
+        magic, version, string_count, tag_count, attribute_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Unsupported catalog format')
+
+        self.buffer = buffer
+        self.strings = [None] * string_count
+
+        self.string_offsets = struct.unpack_from('<{}I'.format(string_count + 1), buffer, HEADER.size)
+        tags_offset = HEADER.size + 4 * (string_count + 1)
+        self.names_offset = tags_offset + TAG.size * tag_count
+        self.types_offset = self.names_offset + 4 * attribute_count
+        self.triggers_offset = self.types_offset + 4 * attribute_count
+        self.contents_offset = self.triggers_offset + 4 * attribute_count
+        self.data_offset = self.contents_offset + 4 * attribute_count
+
+        # tag -> (first attribute, attribute count, required count, trigger, contents)
+        self.tag_entries = {}
+        for i in range(tag_count):
+            entry = TAG.unpack_from(buffer, tags_offset + i * TAG.size)
+            self.tag_entries[self.string(entry[0])] = entry[1:]
+
+        # tag -> decoded attributes
+        self.attributes = {}
+
+    # Returns the sha1 hex digest of the catalog contents
+    def digest(self):
+        return hashlib.sha1(self.buffer).hexdigest()
+
+    # Returns the interned string with the index i
+    def string(self, i):
+        s = self.strings[i]
+        if s is None:
+            a = self.data_offset + self.string_offsets[i]
+            b = self.data_offset + self.string_offsets[i + 1]
+            s = self.strings[i] = sys.intern(bytes(self.buffer[a:b]).decode('utf-8'))
+        return s
+
+    # Returns the strings of the array at offset for the attributes first .. first + count
+    def read_strings(self, offset, first, count):
+        indices = struct.unpack_from('<{}I'.format(count), self.buffer, offset + 4 * first)
+        return [self.string(i) for i in indices]
+
+    # Returns [(name, type)] of the attributes first .. first + count
+    def read_attributes(self, first, count):
+        return list(zip(
+            self.read_strings(self.names_offset, first, count),
+            self.read_strings(self.types_offset, first, count)))
+
+    def tags(self):
+        return list(self.tag_entries)
+
+    # Returns [(tag, (trigger, contents))] of the tag completions
+    def completions(self):
+        return [(tag, (self.string(entry[3]), self.string(entry[4])))
+            for (tag, entry) in self.tag_entries.items()]
+
+    # Returns [(name, type, (trigger, contents))] of the attribute completions of tag
+    def attribute_completions(self, tag):
+        entry = self.tag_entries.get(tag)
+        if entry is None:
+            return []
+
+        first, count = entry[0:2]
+        return list(zip(
+            self.read_strings(self.names_offset, first, count),
+            self.read_strings(self.types_offset, first, count),
+            zip(self.read_strings(self.triggers_offset, first, count),
+                self.read_strings(self.contents_offset, first, count))))
+
+    # Returns [(name, type)] of the required attributes of tag
+    def required_attributes(self, tag):
+        first, count, required = self.tag_entries[tag][0:3]
+        return self.read_attributes(first, required)
+
+    # Returns {name: {'type': type, 'required': bool}} of the attributes of tag,
+    # like aura_tags.tag_dict does
+    def get(self, tag, default=None):
+        attributes = self.attributes.get(tag)
+        if attributes is None:
+            entry = self.tag_entries.get(tag)
+            if entry is None:
+                return default
+
+            first, count, required = entry[0:3]
+            attributes = self.attributes[tag] = dict(
+                (name, {'type': type, 'required': i < required})
+                for i, (name, type) in enumerate(self.read_attributes(first, count)))
+
+        return attributes
+
+    def __contains__(self, tag):
+        return tag in self.tag_entries
+
+    def __len__(self):
+        return len(self.tag_entries)
+
+# Maps the catalog file at path into memory
+def open_catalog(path):
+    with open(path, 'rb') as f:
+        return Catalog(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+# Serializes tag_dict ({tag: {attribute: {'type': type, 'required': bool}}})
+# into the binary catalog format
+def build_catalog(tag_dict):
+    strings = {}
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    tags = []
+    arrays = ([], [], [], [])
+    names, types, triggers, contents = arrays
+    for tag, attributes in tag_dict.items():
+        ordered = sorted(attributes.items(), key=lambda item: not item[1].get('required', False))
+        required = [(name, traits['type']) for (name, traits) in ordered if traits.get('required', False)]
+        trigger, snippet = make_completion(tag, required)
+        tags.append((intern(tag), len(names), len(ordered), len(required), intern(trigger), intern(snippet)))
+        for name, traits in ordered:
+            attribute_trigger, attribute_snippet = make_attribute_completion(name, traits['type'])
+            names.append(intern(name))
+            types.append(intern(traits['type']))
+            triggers.append(intern(attribute_trigger))
+            contents.append(intern(attribute_snippet))
+
+    data = [s.encode('utf-8') for s in sorted(strings, key=strings.get)]
+    offsets = [0]
+    for s in data:
+        offsets.append(offsets[-1] + len(s))
+
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, len(strings), len(tags), len(names)),
+        struct.pack('<{}I'.format(len(offsets)), *offsets),
+        b''.join(TAG.pack(*tag) for tag in tags),
+    ] + [struct.pack('<{}I'.format(len(array)), *array) for array in arrays] + data)
@@ -1,167 +1,497 @@
 import sublime, sublime_plugin
-import re
-from LightningComponentsCompletions.aura_tags import tag_dict as aura_tags
-
-def match(rex, str):
-    m = rex.match(str)
-    if m:
-        return m.group(0)
-    else:
-        return None
-
-def make_completion(tag, attributes):
-    def inc():
-        for i in range(1,100):
-            yield i
-
-    i = inc()
-    required_attributes = [
-        '{}="${{{}:{}}}"'.format(attribute, next(i), traits.get("type")) 
-        for (attribute, traits) in attributes.items() 
-        if traits.get('required', False) == True];
-
-    return (tag + '\tTag', tag +' ' + ' '.join(required_attributes)+ ' ${} >${}</'.format(next(i), next(i)) + tag + '>')
-
-class LightningComponentsCompletions(sublime_plugin.EventListener):
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from LightningComponentsCompletions.aura_catalog import Catalog, open_catalog
+from LightningComponentsCompletions.aura_engine import CompletionEngine
+from LightningComponentsCompletions.aura_stats import PhaseStats, profiled, unwrap_view
+from LightningComponentsCompletions.aura_scope import classify_scope, never_completes
+from LightningComponentsCompletions.aura_tracker import TagTracker
+from LightningComponentsCompletions.aura_workspace import WorkspaceIndex
+
+# Number of threads indexing the custom components of the workspace
+INDEX_WORKERS = 4
+# Delay in milliseconds before the usage counts are saved after a completion
+USAGE_SAVE_DELAY = 5000
+# Delay in milliseconds before the workspace index is listed again or saved after
+# the last change, so that a series of saves or file commands costs one walk and write
+WORKSPACE_UPDATE_DELAY = 2000
+# Side bar commands creating, deleting or renaming files, after which
+# the components of the project folders are listed again
+FILE_COMMANDS = frozenset(['rename_path', 'delete_file', 'delete_folder'])
+# Commands inserting the selected completion
+COMMIT_COMMANDS = frozenset(['commit_completion', 'insert_best_completion'])
+# Sublime Text 4 asks for completions again as the prefix grows with DYNAMIC_COMPLETIONS,
+# so the lists can be cut to the most used ones; Sublime Text 3 filters the first list
+# it got, which then has to hold all of the completions
+DYNAMIC_COMPLETIONS = getattr(sublime, 'DYNAMIC_COMPLETIONS', 0)
+COMPLETION_FLAGS = (sublime.INHIBIT_WORD_COMPLETIONS | sublime.INHIBIT_EXPLICIT_COMPLETIONS |
+    DYNAMIC_COMPLETIONS)
+# Sublime Text 4 completions filled in after on_query_completions returned,
+# None on Sublime Text 3 which completes synchronously
+CompletionList = getattr(sublime, 'CompletionList', None)
+
+SETTINGS_FILE = 'LightningComponentsCompletions.sublime-settings'
+# Methods timed while profile_completions is set, the first one receives the view
+# the phases of the engine are timed by CompletionEngine.set_profiling
+PROFILED_METHODS = ('on_query_completions', 'get_completions', 'get_query')
+# Latency of the completion phases, recorded while profile_completions is set
+phase_stats = PhaseStats()
+# Completions of all Aura views, created when the first Aura view shows up
+# so that sessions without one never load the catalog
+shared_completions = None
+shared_completions_lock = threading.Lock()
+
+# Extensions of the Aura files, which HTML.sublime-settings opens as HTML
+AURA_EXTENSIONS = frozenset(['.cmp', '.evt', '.app', '.auradoc', '.design'])
+# View setting marking the views of Aura files, which get completions
+AURA_VIEW_SETTING = 'lightning_components'
+
+# Catalog of the standard tags, built by catalog/build.py
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'catalog', 'aura_tags.bin')
+CATALOG_RESOURCE = 'Packages/LightningComponentsCompletions/catalog/aura_tags.bin'
+
+# Folder of the index snapshots and usage counts, kept between sessions
+def cache_dir():
+    return os.path.join(sublime.cache_path(), 'LightningComponentsCompletions')
+
+# Index of the custom components, kept between sessions
+def workspace_cache_path():
+    return os.path.join(cache_dir(), 'workspace.index')
+
+# Returns read(a, b) over the text of the view
+def view_reader(view):
+    return lambda a, b: view.substr(sublime.Region(a, b))
+
+# Maps the catalog file into memory, or reads it from the
+# .sublime-package archive when the package is not extracted
+def load_catalog():
+    if os.path.exists(CATALOG_PATH):
+        return open_catalog(CATALOG_PATH)
+    return Catalog(sublime.load_binary_resource(CATALOG_RESOURCE))
+
+# Returns whether the view shows an Aura file, by its extension
+def is_aura_file(view):
+    name = view.file_name()
+    return bool(name) and os.path.splitext(name)[1].lower() in AURA_EXTENSIONS
+
+# Returns whether the syntax set in the view settings is an Aura syntax
+def is_aura_syntax(settings):
+    syntax = settings.get('syntax') or ''
+    return 'aura' in os.path.basename(syntax).lower()
+
+class LightningComponentsCompletions(object):
+
+    # Completions shared by the views, to apply settings to
+    instances = []
 
     # Constructor
-    # Generates list of aura tags and tag to attributes dictionary
-    def __init__(self):  
-        self.prefix_completion_dict = self.default_completion_list()
-        self.tag_to_attributes = aura_tags
-
-    def default_completion_list(self):
-        default_list = []
-
-        for tag, attributes in aura_tags.items():
-            default_list.append(make_completion(tag, attributes))
-
-        prefix_completion_dict = {}
-
-        for s in default_list:
-            prefix = s[0][0]
-            prefix_completion_dict.setdefault(prefix, []).append(s)
+    # Adapts the completion engine to the views: reads them, follows their
+    # edits and indexes the custom components of the project folders
+    def __init__(self):
+        self.engine = CompletionEngine(load_catalog(), cache_dir(), keep_rest=not DYNAMIC_COMPLETIONS)
+        # custom components found in the project folders
+        self.workspace = WorkspaceIndex()
+        self.index_executor = ThreadPoolExecutor(max_workers=INDEX_WORKERS)
+        self.indexing = False
+        self.indexed_folders = None
+        # number of the last workspace change, earlier delayed updates are dropped,
+        # and whether the update lists the components again
+        self.workspace_generation = 0
+        self.workspace_prune = False
+        # looks up the completions involving custom components, one query at a time
+        self.completion_executor = ThreadPoolExecutor(max_workers=1)
+        # view id -> number of the last completion query, older ones are dropped
+        self.generations = {}
+        # ids of the views whose syntax is never offered completions,
+        # forgotten when the syntax may have changed
+        self.unmatched_views = set()
+        LightningComponentsCompletions.instances.append(self)
+        # buffer id -> TagTracker and TagTrackerListener following its edits
+        self.trackers = {}
+        self.text_listeners = {}
+        # ids of the buffers whose selection was a single caret before the last edit
+        self.carets = set()
+
+    # Wraps the hot path methods with timers recording into stats, or restores
+    # them when stats is None, so that profiling costs nothing while it is off
+    def set_profiling(self, stats):
+        for name in PROFILED_METHODS:
+            self.__dict__.pop(name, None)
+
+        if stats is not None:
+            for name in PROFILED_METHODS:
+                setattr(self, name, profiled(stats, name, getattr(self, name),
+                    wrap_view=(name == 'on_query_completions')))
+
+        self.engine.set_profiling(stats)
+
+    # Counts the completion inserted by a commit of the last completions
+    def on_post_text_command(self, view, command_name, args):
+        if command_name == 'set_file_type':
+            self.unmatched_views.discard(view.id())
+            return
+
+        if command_name not in COMMIT_COMMANDS:
+            return
+
+        if self.engine.record_completion(view.id(), view_reader(view)):
+            sublime.set_timeout_async(self.engine.save_usage, USAGE_SAVE_DELAY)
+
+    # Indexes the custom components of the open project folders
+    # whenever they change, parsing runs on the index executor
+    def on_activated_async(self, view):
+        folders = tuple(sorted(set(
+            folder for window in sublime.windows() for folder in window.folders())))
+        if self.indexing or folders == self.indexed_folders:
+            return
+
+        self.indexing = True
+        self.index_executor.submit(self.index_workspace, folders)
+
+    def index_workspace(self, folders):
+        try:
+            if self.indexed_folders is None and self.workspace.load(workspace_cache_path()):
+                # serve the saved index right away, then check it against the files
+                if self.workspace.folders == folders:
+                    self.update_custom_components()
+
+            self.workspace.index_folders(folders, self.index_executor)
+            self.indexed_folders = folders
+        finally:
+            self.indexing = False
+
+        self.update_custom_components()
+        self.workspace.save(workspace_cache_path())
+
+    # Reindexes the saved component alone, the index is saved a while later
+    def on_post_save_async(self, view):
+        # saving under another extension may change the syntax
+        self.unmatched_views.discard(view.id())
+
+        path = view.file_name()
+        if not path or not path.endswith('.cmp') or self.indexing or self.indexed_folders is None:
+            return
+
+        if self.workspace.update_component(path):
+            self.update_custom_components()
+            self.schedule_workspace_update(False)
+
+    # Lists the components again a while after files were created, deleted
+    # or renamed from the side bar
+    def on_post_window_command(self, window, command_name, args):
+        if command_name in FILE_COMMANDS and self.indexed_folders is not None:
+            self.schedule_workspace_update(True)
+
+    # Saves the workspace index, listing the components again first with prune,
+    # once no other change came for WORKSPACE_UPDATE_DELAY
+    def schedule_workspace_update(self, prune):
+        self.workspace_prune = self.workspace_prune or prune
+        self.workspace_generation += 1
+        generation = self.workspace_generation
+        sublime.set_timeout_async(lambda: self.update_workspace(generation), WORKSPACE_UPDATE_DELAY)
+
+    def update_workspace(self, generation):
+        if generation != self.workspace_generation:
+            return
+
+        prune, self.workspace_prune = self.workspace_prune, False
+        self.index_executor.submit(self.prune_workspace, prune)
+
+    def prune_workspace(self, prune):
+        # a running index lists the components and saves them itself
+        if self.indexing:
+            return
+
+        if prune and self.workspace.prune():
+            self.update_custom_components()
+        self.workspace.save(workspace_cache_path())
+
+    # Sets the current custom components on the engine, which keeps
+    # the newest ones when updates from several threads cross
+    def update_custom_components(self):
+        version, tags = self.workspace.tags()
+        self.engine.set_custom_components(tags, version)
+
+    # Returns the tag tracker of the view's buffer, or None while it is not in sync
+    # a missing or stale tracker is built right after the current query
+    def tag_tracker(self, view):
+        tracker = self.trackers.get(view.buffer_id())
+        if tracker is not None and tracker.size == view.size():
+            return tracker
+
+        # the view itself, so that copying the buffer is not timed as part of the query
+        view = unwrap_view(view)
+        sublime.set_timeout(lambda: self.build_tag_tracker(view), 0)
+        return None
 
-        return prefix_completion_dict
+    def build_tag_tracker(self, view):
+        if not view.is_valid():
+            return
+
+        buffer_id = view.buffer_id()
+        tracker = self.trackers.get(buffer_id)
+        if tracker is not None and tracker.size == view.size():
+            return
+
+        text = view.substr(sublime.Region(0, view.size()))
+        if tracker is not None:
+            tracker.rebuild(text)
+            return
+
+        tracker = self.trackers[buffer_id] = TagTracker(text)
+        if TagTrackerListener is not None:
+            listener = self.text_listeners[buffer_id] = TagTrackerListener(tracker)
+            listener.attach(view.buffer())
+
+    # Remembers the buffers whose selection is a single caret, on Sublime Text 3
+    # after an edit typing over a selection looks like plain typing
+    def on_selection_modified(self, view):
+        buffer_id = view.buffer_id()
+        if buffer_id not in self.trackers or buffer_id in self.text_listeners:
+            return
+
+        sel = view.sel()
+        if len(sel) == 1 and sel[0].empty():
+            self.carets.add(buffer_id)
+        else:
+            self.carets.discard(buffer_id)
+
+    # Follows edits on Sublime Text 3, which has no TextChangeListener
+    # only single cursor typing and deleting can be told from the view,
+    # anything else rebuilds the tracker on next use
+    def on_modified(self, view):
+        buffer_id = view.buffer_id()
+        tracker = self.trackers.get(buffer_id)
+        if tracker is None or buffer_id in self.text_listeners:
+            return
+
+        # an invalidated tracker is left to build_tag_tracker
+        if tracker.size < 0:
+            return
+
+        delta = view.size() - tracker.size
+        sel = view.sel()
+        if delta == 0 or buffer_id not in self.carets or len(sel) != 1 or not sel[0].empty():
+            tracker.invalidate()
+            return
+
+        pt = sel[0].b
+        if delta > 0:
+            tracker.replace(pt - delta, pt - delta, view.substr(sublime.Region(pt - delta, pt)))
+        else:
+            tracker.replace(pt, pt - delta, '')
+
+    def on_load(self, view):
+        self.unmatched_views.discard(view.id())
+
+    def on_revert(self, view):
+        tracker = self.trackers.get(view.buffer_id())
+        if tracker is not None:
+            tracker.invalidate()
+
+    def on_close(self, view):
+        self.generations.pop(view.id(), None)
+        self.unmatched_views.discard(view.id())
+        buffer_id = view.buffer_id()
+        self.trackers.pop(buffer_id, None)
+        self.carets.discard(buffer_id)
+        listener = self.text_listeners.pop(buffer_id, None)
+        if listener is not None and listener.is_attached():
+            listener.detach()
 
     def on_query_completions(self, view, prefix, locations):
-
-        if not (
-                view.match_selector(locations[0], "text.html - source - string.quoted")
-                or 
-                view.match_selector(locations[0], "text.xml - source - string.quoted")
-                ):
+        if view.id() in self.unmatched_views:
             return []
 
-        # check if we are inside a tag
-        is_inside_tag = (
-            view.match_selector(locations[0], "text.html meta.tag - text.html punctuation.definition.tag.begin")
-            or
-            view.match_selector(locations[0], "text.xml meta.tag - text.html punctuation.definition.tag.begin")
-            )
-
-        return self.get_completions(view, prefix, locations, is_inside_tag)
-
-    def get_completions(self, view, prefix, locations, is_inside_tag):
-        prefix = self.expand_prefix(view, locations)
-        pt = locations[0] - len(prefix) - 1
-        ch = view.substr(sublime.Region(pt, pt + 1))
+        # classify the scope at the cursor: completions are offered in html
+        # and xml text, and they are attribute completions inside a tag
+        scope = view.scope_name(locations[0])
+        completes, is_inside_tag = classify_scope(scope)
+        if not completes:
+            if never_completes(scope):
+                self.unmatched_views.add(view.id())
+            return []
 
+        if CompletionList is None:
+            return self.get_completions(view, prefix, locations, is_inside_tag)
 
-        completion_list = []
-        flags = sublime.INHIBIT_WORD_COMPLETIONS | sublime.INHIBIT_EXPLICIT_COMPLETIONS
+        # the view is read here, only the lookup may be left to the worker
+        query = self.get_query(view, locations, is_inside_tag)
+        view_id = view.id()
+        generation = self.generations[view_id] = self.generations.get(view_id, 0) + 1
+        if not self.engine.is_workspace_query(query):
+            return (self.engine.complete(query), COMPLETION_FLAGS)
 
-        if is_inside_tag and ch in [' ', '\t', '\n']:
-            completion_list = self.get_attribute_completions(view, locations[0], prefix)
-            return (completion_list, flags)
+        completion_list = CompletionList()
+        self.completion_executor.submit(self.complete_async, view_id, generation, query, completion_list)
+        return completion_list
 
-        if prefix == []:
-            return ([], flags)
+    # Fills completion_list with the completions of query, unless a newer
+    # query of the view was made meanwhile
+    def complete_async(self, view_id, generation, query, completion_list):
+        if self.generations.get(view_id) != generation:
+            return
 
-        # match completion list using prefix
-        completion_list = self.prefix_completion_dict.get(prefix[0], [])
-        # if the opening < is not here insert that
-        if ch != '<':
-            completion_list = [(pair[0], '<' + pair[1]) for pair in completion_list]
+        completions = self.engine.complete(query)
+        if self.generations.get(view_id) != generation:
+            return
 
-        return (completion_list, flags)
+        completion_list.set_completions(list(completions), COMPLETION_FLAGS)
 
+    def get_completions(self, view, prefix, locations, is_inside_tag):
+        return (self.engine.complete(self.get_query(view, locations, is_inside_tag)), COMPLETION_FLAGS)
+
+    # Reads what the completions at locations depend on from the view
+    def get_query(self, view, locations, is_inside_tag):
+        return self.engine.get_query(view_reader(view), locations, is_inside_tag,
+            view.id(), lambda: self.tag_tracker(view))
 
-    def expand_prefix(self, view, locations):
-        # Get the contents of each line, from the beginning of the line to
-        # each point
-        lines = [view.substr(sublime.Region(view.line(l).a, l))
-            for l in locations]
+# Shows the completions of the tag at the cursor including all of its event handlers
+class LightningEventAttributesCommand(sublime_plugin.TextCommand):
+
+    def run(self, edit):
+        for listener in LightningComponentsCompletions.instances:
+            listener.engine.show_events.add(self.view.id())
+
+        self.view.run_command('auto_complete', {
+            'disable_auto_insert': True,
+            'next_completion_if_showing': False
+        })
 
-        # print("lines:", lines)
-        # Reverse the contents of each line, to simulate having the regex
-        # match backwards
-        lines = [l[::-1] for l in lines]
+# Shows the latency histograms recorded while profile_completions is set
+class LightningCompletionsLatencyCommand(sublime_plugin.WindowCommand):
+
+    def run(self, clear=False):
+        if clear:
+            phase_stats.clear()
+            return
+
+        report = phase_stats.report()
+        if not phase_stats.histograms:
+            report = 'No completions recorded, set "profile_completions" in {} to record them.'.format(SETTINGS_FILE)
+
+        panel = self.window.create_output_panel('lightning_completions_latency')
+        panel.run_command('append', {'characters': report})
+        self.window.run_command('show_panel', {'panel': 'output.lightning_completions_latency'})
+
+# Returns the completions of all Aura views, loading them on first use
+def get_shared_completions():
+    global shared_completions
+    with shared_completions_lock:
+        if shared_completions is None:
+            shared_completions = LightningComponentsCompletions()
+            update_profiling()
+    return shared_completions
+
+# Loads the completions off the main thread when an Aura view is open
+def warm_up():
+    if any(view.settings().get(AURA_VIEW_SETTING, False) or is_aura_file(view)
+            for window in sublime.windows() for view in window.views()):
+        get_shared_completions()
 
-        # Check the first location looks like an expression
-        # print('line:', lines[0])
-        rex = re.compile("([\w:]+)")
-        expr = match(rex, lines[0])
+# Marks the views of Aura files, the views are reconsidered
+# by the view listener when they are loaded or activated
+class LightningComponentsEventListener(sublime_plugin.EventListener):
+
+    def mark_view(self, view):
+        if is_aura_file(view) and not view.settings().get(AURA_VIEW_SETTING, False):
+            view.settings().set(AURA_VIEW_SETTING, True)
+
+    def on_new(self, view):
+        self.mark_view(view)
+
+    def on_load(self, view):
+        self.mark_view(view)
+
+    def on_activated(self, view):
+        self.mark_view(view)
+
+    def on_activated_async(self, view):
+        if shared_completions is not None:
+            shared_completions.on_activated_async(view)
+        elif view.settings().get(AURA_VIEW_SETTING, False):
+            get_shared_completions().on_activated_async(view)
+
+    def on_post_save(self, view):
+        self.mark_view(view)
+
+    def on_post_save_async(self, view):
+        if shared_completions is not None:
+            shared_completions.on_post_save_async(view)
+
+    def on_post_window_command(self, window, command_name, args):
+        if shared_completions is not None:
+            shared_completions.on_post_window_command(window, command_name, args)
+
+# Completes the views of Aura files, the other html and xml
+# views get no listener and so cost nothing per keystroke
+class LightningComponentsViewListener(sublime_plugin.ViewEventListener):
+
+    @classmethod
+    def is_applicable(cls, settings):
+        return settings.get(AURA_VIEW_SETTING, False) or is_aura_syntax(settings)
+
+    @classmethod
+    def applies_to_primary_view_only(cls):
+        return False
+
+    def on_query_completions(self, prefix, locations):
+        return get_shared_completions().on_query_completions(self.view, prefix, locations)
+
+    def on_modified(self):
+        if shared_completions is not None:
+            shared_completions.on_modified(self.view)
+
+    def on_selection_modified(self):
+        if shared_completions is not None:
+            shared_completions.on_selection_modified(self.view)
+
+    def on_post_text_command(self, command_name, args):
+        if shared_completions is not None:
+            shared_completions.on_post_text_command(self.view, command_name, args)
+
+    def on_load(self):
+        if shared_completions is not None:
+            shared_completions.on_load(self.view)
+
+    def on_revert(self):
+        if shared_completions is not None:
+            shared_completions.on_revert(self.view)
+
+    def on_close(self):
+        if shared_completions is not None:
+            shared_completions.on_close(self.view)
+
+def update_profiling():
+    enabled = sublime.load_settings(SETTINGS_FILE).get('profile_completions', False)
+    for listener in LightningComponentsCompletions.instances:
+        listener.set_profiling(phase_stats if enabled else None)
+
+def plugin_loaded():
+    sublime.load_settings(SETTINGS_FILE).add_on_change('profile_completions', update_profiling)
+    update_profiling()
+    sublime.set_timeout_async(warm_up, 0)
+
+def plugin_unloaded():
+    sublime.load_settings(SETTINGS_FILE).clear_on_change('profile_completions')
+
+if hasattr(sublime_plugin, 'TextChangeListener'):
+
+    # Sublime Text 4 reports the exact edits of a buffer
+    class TagTrackerListener(sublime_plugin.TextChangeListener):
 
-        if not expr:
-            return []
+        # attached on demand to the buffers having a tracker
+        @classmethod
+        def is_applicable(cls, buffer):
+            return False
 
-        # Ensure that all other lines have identical expressions
-        for i in range(1, len(lines)):
-            ex = match(rex, lines[i])
-            if ex != expr:
-                return []
-
-        # Return the completions
-        tag = rex.match(expr).groups()[0][::-1]
-        return tag
-
-    def get_attribute_completions(self, view, pt, prefix):
-        SEARCH_LIMIT = 500
-        search_start = max(0, pt - SEARCH_LIMIT - len(prefix))
-        line = view.substr(sublime.Region(search_start, pt + SEARCH_LIMIT))
-
-        line_head = line[0:pt - search_start]
-        line_tail = line[pt - search_start:]
-
-        # find the tag from end of line_head
-        i = len(line_head) - 1
-        tag = None
-        space_index = len(line_head)
-        while i >= 0:
-            c = line_head[i]
-            if c == '<':
-                # found the open tag
-                tag = line_head[i + 1:space_index]
-                break
-            elif c == ' ':
-                space_index = i
-            i -= 1
-
-        # check that this tag looks valid
-        # 
-        if not tag:
-            return []
+        def __init__(self, tracker):
+            super().__init__()
+            self.tracker = tracker
 
-        # determines whether we need to close the tag
-        # default to closing the tag
-        suffix = '>'
-
-        for c in line_tail:
-            if c == '>':
-                # found end tag
-                suffix = ''
-                break
-            elif c == '<':
-                # found another open tag, need to close this one
-                break
-
-        if suffix == '' and not line_tail.startswith(' ') and not line_tail.startswith('>'):
-            # add a space if not there
-            suffix = ' '
-
-        # got the tag, now find all attributes that match
-        attributes = self.tag_to_attributes.get(tag, [])
-        # ("class\tAttr", "class="$1">"),
-        attri_completions = [ (name + '\t' + values['type'], name + '="${1:'+ values['type'] +'}" $2' + suffix) for name,values in attributes.items()]
-        return attri_completions
\ No newline at end of file
+        def on_text_changed(self, changes):
+            for change in changes:
+                self.tracker.replace(change.a.pt, change.b.pt, change.str)
+else:
+    TagTrackerListener = None
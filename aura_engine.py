@@ -0,0 +1,326 @@
+import functools
+import os
+import re
+import threading
+from LightningComponentsCompletions.aura_fuzzy import FuzzyIndex
+from LightningComponentsCompletions.aura_index import TagIndex, index_key, load_index, save_index
+from LightningComponentsCompletions.aura_stats import profiled_phase
+from LightningComponentsCompletions.aura_snippets import make_completion, make_attribute_completion, required_attributes
+from LightningComponentsCompletions.aura_scanner import CHUNK_SIZE, scan_tag, read_tag_head, read_tag_tail, read_common_prefix
+from LightningComponentsCompletions.aura_usage import UsageCounts, top_k
+from LightningComponentsCompletions.aura_workspace import CUSTOM_NAMESPACE
+
+# Number of (tag, suffix) attribute completion lists kept in memory
+ATTRIBUTE_CACHE_SIZE = 128
+# Number of the most used completions moved first, the list is cut there
+# unless the engine keeps the rest, see CompletionEngine.keep_rest
+RESULT_LIMIT = 50
+# Type of the event handler attributes, e.g. keyup or mousemove of the ui: tags
+EVENT_TYPE = 'COMPONENT'
+# Name inserted by a tag or attribute completion
+COMPLETED_NAME = re.compile(r'<?([\w:-]+)')
+
+# Phases timed while profiling
+PROFILED_METHODS = ('expand_prefix', 'get_attribute_query', 'get_tag_head', 'complete')
+
+# Returns the tag or attribute name of a completion
+def completion_name(completion):
+    return completion[0].partition('\t')[0]
+
+# Returns read(a, b) over the text of a string, for completing outside the editor
+def text_reader(text):
+    return lambda a, b: text[max(a, 0):max(b, 0)]
+
+class CompletionEngine(object):
+
+    # Constructor
+    # Completes the tags and attributes of the catalog and of the custom components
+    # the buffers are read through read(a, b), which returns the text between a and b
+    # the built indexes and the usage counts are kept in cache_dir when it is set
+    # with keep_rest the completions past RESULT_LIMIT follow the most used ones,
+    # for editors which filter the first list as the user types instead of asking again
+    def __init__(self, catalog, cache_dir=None, keep_rest=False):
+        self.cache_dir = cache_dir
+        self.keep_rest = keep_rest
+        self.default_completions = self.default_completion_list(catalog)
+        self.catalog_digest = catalog.digest()
+        self.tag_index = self.load_tag_index('catalog', self.catalog_digest, self.default_completions)
+        self.tag_to_attributes = catalog
+        # custom components found in the project folders, tag -> attributes
+        self.custom_tag_to_attributes = {}
+        # version of the custom components, older ones are not set over newer ones
+        self.custom_version = None
+        self.update_lock = threading.Lock()
+        # counts of the accepted completions, loaded on first use
+        self.usage = None
+        # key -> (start of the prefix, tag) of the last completions,
+        # tag is None for tag completions
+        self.last_queries = {}
+        # keys of the buffers whose next attribute completions include all events
+        self.show_events = set()
+        self.attribute_completions = functools.lru_cache(maxsize=ATTRIBUTE_CACHE_SIZE)(
+            self.make_attribute_completions)
+        self.attribute_index = functools.lru_cache(maxsize=ATTRIBUTE_CACHE_SIZE)(
+            self.make_attribute_index)
+
+    # Wraps the phase methods with timers recording into stats, or restores
+    # them when stats is None
+    def set_profiling(self, stats):
+        for name in PROFILED_METHODS:
+            self.__dict__.pop(name, None)
+
+        if stats is not None:
+            for name in PROFILED_METHODS:
+                setattr(self, name, profiled_phase(stats, name, getattr(self, name)))
+
+    def default_completion_list(self, catalog):
+        return catalog.completions()
+
+    # Returns the path of a file kept in cache_dir, or None without one
+    def cache_path(self, name):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, name)
+
+    # Reads the tag index saved under key, or builds it from completions and saves it
+    def load_tag_index(self, name, key, completions):
+        path = self.cache_path(name + '.snapshot')
+        if path is None:
+            return TagIndex(completions)
+
+        tag_index = load_index(path, key)
+        if tag_index is None:
+            tag_index = TagIndex(completions)
+            save_index(tag_index, path, key)
+        return tag_index
+
+    def get_usage(self):
+        if self.usage is None:
+            usage = UsageCounts()
+            path = self.cache_path('usage.counts')
+            if path is not None:
+                usage.load(path)
+            self.usage = usage
+        return self.usage
+
+    def save_usage(self):
+        path = self.cache_path('usage.counts')
+        if path is not None and self.usage is not None and self.usage.changed:
+            self.usage.save(path)
+
+    # Counts the completion inserted by a commit of the last completions of key
+    # returns whether the usage counts changed
+    def record_completion(self, key, read):
+        query = self.last_queries.pop(key, None)
+        if query is None:
+            return False
+
+        start, tag = query
+        m = COMPLETED_NAME.match(read(start, start + 100))
+        if not m:
+            return False
+
+        name = m.group(1)
+        usage = self.get_usage()
+        if tag is None:
+            if name in self.tag_to_attributes or name in self.custom_tag_to_attributes:
+                usage.add(name)
+        else:
+            attributes = self.custom_tag_to_attributes.get(tag) or self.tag_to_attributes.get(tag, {})
+            if name in attributes:
+                usage.add((tag, name))
+
+        return usage.changed
+
+    # Merges the custom components, tag -> attributes, into the tag index
+    # and the attribute lookup, replacing both at once
+    # version orders the updates made from several threads, an update older
+    # than the components already set is ignored, returns whether they were set
+    def set_custom_components(self, custom_tag_to_attributes, version=None):
+        with self.update_lock:
+            if version is not None and self.custom_version is not None and version <= self.custom_version:
+                return False
+
+            custom_completions = sorted(
+                (tag, make_completion(tag, required_attributes(attributes)))
+                for (tag, attributes) in custom_tag_to_attributes.items())
+            self.tag_index = self.load_tag_index('workspace',
+                index_key(self.catalog_digest, custom_completions),
+                self.default_completions + custom_completions)
+            self.custom_tag_to_attributes = custom_tag_to_attributes
+            self.custom_version = version
+            self.attribute_completions.cache_clear()
+            self.attribute_index.cache_clear()
+            return True
+
+    # Returns the completions at locations
+    def get_completions(self, read, locations, is_inside_tag, key=None, get_tracker=None):
+        return self.complete(self.get_query(read, locations, is_inside_tag, key, get_tracker))
+
+    # Reads what the completions at locations depend on from the buffer, returns
+    # ('tag', prefix, bracketed), ('attribute', prefix, tag, suffix, present, show_events)
+    # or None when there is nothing to complete
+    # key identifies the buffer for record_completion and show_events,
+    # get_tracker() returns its tag tracker when it is in sync, or None
+    def get_query(self, read, locations, is_inside_tag, key=None, get_tracker=None):
+        prefix = self.expand_prefix(read, locations)
+        pt = locations[0] - len(prefix) - 1
+        ch = read(pt, pt + 1)
+
+        if is_inside_tag and ch in [' ', '\t', '\n']:
+            return self.get_attribute_query(read, locations[0], prefix, key, get_tracker)
+
+        if not prefix:
+            return None
+
+        self.last_queries[key] = (pt + 1, None)
+        # if the opening < is not here use the variant which inserts that
+        return ('tag', prefix, ch != '<')
+
+    # Returns whether the completions of query may come from the custom
+    # components, or from an abbreviation search over all tags
+    def is_workspace_query(self, query):
+        if query is None or not self.custom_tag_to_attributes:
+            return False
+
+        if query[0] == 'attribute':
+            return query[2] in self.custom_tag_to_attributes
+
+        namespace, colon, name = query[1].lower().partition(':')
+        if namespace == CUSTOM_NAMESPACE or (not colon and CUSTOM_NAMESPACE.startswith(namespace)):
+            return True
+        return not self.tag_index.lookup(query[1], query[2])
+
+    # Returns the completions of a query of get_query, as (trigger, contents) pairs
+    def complete(self, query):
+        if query is None:
+            return []
+        if query[0] == 'attribute':
+            return self.complete_attributes(*query[1:])
+        return self.complete_tags(*query[1:])
+
+    def complete_tags(self, prefix, bracketed):
+        # match completion list using the whole prefix
+        completion_list = self.tag_index.lookup(prefix, bracketed)
+        if not completion_list:
+            # no tag starts with the prefix, rank the best tags it abbreviates
+            completion_list = self.tag_index.search(prefix, bracketed, RESULT_LIMIT, self.keep_rest)
+
+        usage = self.get_usage()
+        return top_k(completion_list,
+            lambda completion: usage.score(completion_name(completion)), RESULT_LIMIT, self.keep_rest)
+
+
+    def expand_prefix(self, read, locations):
+        # Scan back from each location over the word and colon characters
+        # and ensure that all locations have identical prefixes
+        return read_common_prefix(read, locations)
+
+    def get_attribute_completions(self, read, pt, prefix, key=None, get_tracker=None):
+        return self.complete(self.get_attribute_query(read, pt, prefix, key, get_tracker))
+
+    def get_attribute_query(self, read, pt, prefix, key=None, get_tracker=None):
+        # find the open tag containing pt
+        line_head = self.get_tag_head(read, pt, get_tracker)
+        if line_head is None:
+            return None
+
+        line_tail = read_tag_tail(read, pt)
+
+        # tokenize the tag once, collecting the attributes already present
+        # and whether the tag is already closed
+        tag, present, closed = scan_tag(line_head[1:] + line_tail, len(line_head) - 1)
+
+        # check that this tag looks valid
+        #
+        if not tag:
+            return None
+
+        # determines whether we need to close the tag
+        # default to closing the tag
+        suffix = '>'
+
+        if closed:
+            # found end tag
+            suffix = ''
+
+        if suffix == '' and not line_tail.startswith(' ') and not line_tail.startswith('>'):
+            # add a space if not there
+            suffix = ' '
+
+        # event handlers are only listed once the prefix starts an event name,
+        # or when asked for with the lightning_event_attributes command
+        show_events = key in self.show_events
+        self.show_events.discard(key)
+
+        self.last_queries[key] = (pt - len(prefix), tag)
+        return ('attribute', prefix, tag, suffix, present, show_events)
+
+    def complete_attributes(self, prefix, tag, suffix, present, show_events):
+        # got the tag, now find all attributes that match
+        completions, events = self.attribute_completions(tag, suffix)
+        if events and not show_events:
+            key = prefix.lower()
+            events = tuple(event for event in events
+                if prefix and completion_name(event).lower().startswith(key))
+
+        if prefix:
+            # the attributes the prefix abbreviates first, best match first
+            ranked = self.attribute_index(tag).search(prefix)
+            ranked_set = set(ranked)
+            completions = tuple([completions[i] for i in ranked] + list(events) +
+                [completion for (i, completion) in enumerate(completions) if i not in ranked_set])
+        elif events:
+            completions = completions + events
+
+        if present:
+            completions = tuple(completion for completion in completions
+                if completion_name(completion) not in present)
+
+        usage = self.get_usage()
+        return top_k(completions,
+            lambda completion: usage.score((tag, completion_name(completion))), RESULT_LIMIT, self.keep_rest)
+
+    # Returns the text from the last < before pt up to pt, or None without one
+    # uses the tag tracker when it is in sync, otherwise scans back from pt
+    def get_tag_head(self, read, pt, get_tracker=None):
+        tracker = get_tracker() if get_tracker is not None else None
+
+        if tracker is not None:
+            tag_start = tracker.tag_start(pt)
+            if tag_start is None:
+                # confirm there is no < right before pt, which a missed edit may have added
+                if '<' not in read(max(0, pt - CHUNK_SIZE), pt):
+                    return None
+            else:
+                line_head = read(tag_start, pt)
+                if line_head.startswith('<') and line_head.find('<', 1) < 0:
+                    return line_head
+
+            # the tracker missed an edit
+            tracker.invalidate()
+            get_tracker()
+
+        return read_tag_head(read, pt)
+
+    # Builds the abbreviation index of the tag's attribute names but the
+    # events, in the order of make_attribute_completions
+    def make_attribute_index(self, tag):
+        attributes = self.custom_tag_to_attributes.get(tag) or self.tag_to_attributes.get(tag, {})
+        return FuzzyIndex([name for (name, values) in attributes.items() if values['type'] != EVENT_TYPE])
+
+    # Builds attribute completions of the tag, closed with suffix
+    # returns (attributes, events), the event handlers are kept apart
+    # results are cached per (tag, suffix) by attribute_completions
+    def make_attribute_completions(self, tag, suffix):
+        if tag in self.custom_tag_to_attributes:
+            attributes = [(name, values['type'], make_attribute_completion(name, values['type']))
+                for (name, values) in self.custom_tag_to_attributes[tag].items()]
+        else:
+            attributes = self.tag_to_attributes.attribute_completions(tag)
+
+        completions = [(type == EVENT_TYPE, (trigger, contents + suffix))
+            for (name, type, (trigger, contents)) in attributes]
+        return (
+            tuple(completion for (is_event, completion) in completions if not is_event),
+            tuple(completion for (is_event, completion) in completions if is_event))
@@ -0,0 +1,236 @@
+import heapq
+import re
+import string
+
+# Bit of each character in the character sets, matching is case insensitive
+# characters without a bit of their own share the last one
+CHAR_BITS = dict((c, i) for (i, c) in enumerate(string.ascii_lowercase + string.digits + ':_-'))
+OTHER_BIT = len(CHAR_BITS)
+
+# Score of each matched character, plus the bonuses below
+MATCH_SCORE = 1
+CONSECUTIVE_BONUS = 4
+BOUNDARY_BONUS = 6
+START_BONUS = 8
+
+# Returns {character: [positions]} of the word boundaries of name: its start,
+# the first character after : _ - or . and every uppercase camelCase hump
+def boundaries(name):
+    table = {}
+    previous = ''
+    for i, c in enumerate(name):
+        if i == 0 or previous in ':_-.' or (c.isupper() and not previous.isupper()):
+            table.setdefault(c.lower(), []).append(i)
+        previous = c
+    return table
+
+# Positions of the set bits of each byte value
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+# Runs of bytes with a bit set, the zero bytes between them are skipped at once
+NONZERO_BYTES = re.compile(b'[^\\x00]+')
+
+# Returns the integer with the bits at positions set
+def bitset(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for i in positions:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bytes(bits), 'little')
+
+# Returns the positions of the set bits of the integer
+def positions(bits, size):
+    result = []
+    for run in NONZERO_BYTES.finditer(bits.to_bytes((size + 7) // 8, 'little')):
+        for offset, byte in enumerate(run.group(), run.start()):
+            result.extend((offset << 3) + bit for bit in BYTE_BITS[byte])
+    return result
+
+class FuzzyIndex(object):
+
+    # Constructor
+    # Precomputes the boundary table of each name and, for each character,
+    # the set of names containing it, the set of names with a word starting
+    # with it, the set of names with a word right after it and the set of names
+    # whose namespace starts with it, as bits of an integer indexed by name
+    # the namespace, e.g. c of c:accountList, is not one of the words
+    def __init__(self, names):
+        self.names = [name.lower() for name in names]
+        self.boundaries = [boundaries(name) for name in names]
+        self.boundary_positions = [
+            frozenset(pos for positions in table.values() for pos in positions)
+            for table in self.boundaries]
+
+        containing = [[] for bit in range(OTHER_BIT + 1)]
+        starting = [[] for bit in range(OTHER_BIT + 1)]
+        preceding = [[] for bit in range(OTHER_BIT + 1)]
+        namespace_starting = [[] for bit in range(OTHER_BIT + 1)]
+        for i, name in enumerate(self.names):
+            for c in set(name):
+                containing[CHAR_BITS.get(c, OTHER_BIT)].append(i)
+            has_namespace = name.find(':') > 0
+            if has_namespace:
+                namespace_starting[CHAR_BITS.get(name[0], OTHER_BIT)].append(i)
+            for c, word_positions in self.boundaries[i].items():
+                if not has_namespace or word_positions[-1] > 0:
+                    starting[CHAR_BITS.get(c, OTHER_BIT)].append(i)
+            for c in set(name[pos - 1] for pos in self.boundary_positions[i] if pos > 0):
+                preceding[CHAR_BITS.get(c, OTHER_BIT)].append(i)
+
+        size = len(self.names)
+        self.containing = [bitset(indices, size) for indices in containing]
+        self.starting = [bitset(indices, size) for indices in starting]
+        self.preceding = [bitset(indices, size) for indices in preceding]
+        self.namespace_starting = [bitset(indices, size) for indices in namespace_starting]
+        self.lengths = [len(name) for name in self.names]
+
+    # Returns the index as plain values, for marshal
+    def snapshot(self):
+        return (self.names, self.boundaries, self.boundary_positions,
+            self.containing, self.starting, self.preceding, self.namespace_starting, self.lengths)
+
+    # Returns the index of a snapshot, without building it again
+    @classmethod
+    def restore(cls, snapshot):
+        self = cls.__new__(cls)
+        (self.names, self.boundaries, self.boundary_positions,
+            self.containing, self.starting, self.preceding, self.namespace_starting, self.lengths) = snapshot
+        return self
+
+    # Returns the score of query (lower cased) as a subsequence of the name i,
+    # or None when it is not one
+    # each character continues the current run when it can, otherwise jumps
+    # to the next word boundary starting with it, otherwise to its next occurrence,
+    # as long as the rest of the query still fits after the position taken
+    def score(self, query, i):
+        name = self.names[i]
+        table = self.boundaries[i]
+        boundary_positions = self.boundary_positions[i]
+
+        # the last position each character can take with the rest still fitting after it
+        latest = [0] * len(query)
+        end = len(name)
+        for k in range(len(query) - 1, -1, -1):
+            end = name.rfind(query[k], 0, end)
+            if end < 0:
+                return None
+            latest[k] = end
+
+        score = 0
+        pos = 0
+        previous = -2
+        for k, c in enumerate(query):
+            if name.startswith(c, pos) and pos <= latest[k]:
+                found = pos
+            else:
+                found = -1
+                for b in table.get(c, ()):
+                    if b > latest[k]:
+                        break
+                    if b >= pos:
+                        found = b
+                        break
+                if found < 0:
+                    found = name.find(c, pos)
+
+            score += MATCH_SCORE
+            if found == previous + 1:
+                score += CONSECUTIVE_BONUS
+            if found == 0:
+                score += START_BONUS
+            elif found in boundary_positions:
+                score += BOUNDARY_BONUS
+
+            previous = found
+            pos = found + 1
+
+        # prefer the shorter of equally matching names
+        return score * 1000 - len(name)
+
+    # Returns the indices of the names matching query, best first, at most limit
+    # with keep_rest the other candidates follow in their order, unranked
+    # and some of them may not match, for editors filtering the list themselves
+    # the query has to start a word of the name, or start its namespace when a
+    # later character of the query starts a word; the candidates are the names
+    # containing every character of the query, found with one AND per character
+    def search(self, query, limit=None, keep_rest=False):
+        query = query.lower()
+        if not query:
+            return []
+
+        first = CHAR_BITS.get(query[0], OTHER_BIT)
+        later_starting = 0
+        for c in set(query[1:]):
+            later_starting |= self.starting[CHAR_BITS.get(c, OTHER_BIT)]
+
+        candidates = self.starting[first] | (self.namespace_starting[first] & later_starting)
+        for c in set(query):
+            candidates &= self.containing[CHAR_BITS.get(c, OTHER_BIT)]
+
+        if limit is None:
+            scored = []
+            for i in positions(candidates, len(self.names)):
+                score = self.score(query, i)
+                if score is not None:
+                    scored.append((-score, i))
+            scored.sort()
+            return [i for (score, i) in scored]
+
+        # the best limit names as (score, -index), the worst one first
+        best = []
+        for bound, tier in self.tiers(query, candidates):
+            # the names of a tier may score up to its bound less their length,
+            # they are scored shortest first until they can not beat the worst one kept
+            if len(best) == limit and bound * 1000 - 1 < best[0][0]:
+                break
+
+            names = positions(tier, len(self.names))
+            names.sort(key=self.lengths.__getitem__)
+            for i in names:
+                if len(best) == limit and bound * 1000 - self.lengths[i] < best[0][0]:
+                    break
+
+                score = self.score(query, i)
+                if score is None:
+                    continue
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -i))
+                elif (score, -i) > best[0]:
+                    heapq.heapreplace(best, (score, -i))
+
+        ranked = [-i for (score, i) in sorted(best, reverse=True)]
+        if keep_rest:
+            ranked_set = set(ranked)
+            ranked.extend(i for i in positions(candidates, len(self.names)) if i not in ranked_set)
+        return ranked
+
+    # Splits the candidates by the highest score their names may get, adding
+    # up the bonuses each character of the query may take: the start bonus when
+    # the first character starts the name, the boundary bonus when a character
+    # starts a word and both with the consecutive one when that word follows
+    # the previous character
+    # returns the (bound, names) pairs, highest bound first
+    def tiers(self, query, candidates):
+        first = CHAR_BITS.get(query[0], OTHER_BIT)
+        first_starting = self.starting[first] | self.namespace_starting[first]
+        bounds = {
+            MATCH_SCORE + max(START_BONUS, BOUNDARY_BONUS): candidates & first_starting,
+            MATCH_SCORE: candidates & ~first_starting
+        }
+
+        for previous, c in zip(query, query[1:]):
+            starting = self.starting[CHAR_BITS.get(c, OTHER_BIT)]
+            following = starting & self.preceding[CHAR_BITS.get(previous, OTHER_BIT)]
+            bonuses = (
+                (CONSECUTIVE_BONUS + BOUNDARY_BONUS, following),
+                (max(CONSECUTIVE_BONUS, BOUNDARY_BONUS), starting & ~following),
+                (CONSECUTIVE_BONUS, ~starting))
+
+            next_bounds = {}
+            for bound, names in bounds.items():
+                for bonus, bits in bonuses:
+                    tier = names & bits
+                    if tier:
+                        key = bound + MATCH_SCORE + bonus
+                        next_bounds[key] = next_bounds.get(key, 0) | tier
+            bounds = next_bounds
+
+        return sorted(((bound, names) for (bound, names) in bounds.items() if names), reverse=True)
@@ -0,0 +1,127 @@
+import bisect
+import hashlib
+import marshal
+from LightningComponentsCompletions.aura_cache import read_cache, write_cache
+from LightningComponentsCompletions.aura_fuzzy import FuzzyIndex
+
+# Highest code point, used as the upper bound of a prefix range
+PREFIX_END = '\U0010ffff'
+# Shortest prefix matched as an abbreviation, shorter ones match too many tags
+FUZZY_MIN_LENGTH = 2
+# Version of the index snapshots, bumped whenever the indexes change shape
+SNAPSHOT_VERSION = 2
+
+class SortedCompletions(object):
+
+    # Sorts (key, completion) pairs by lower cased key, so every prefix maps
+    # to a contiguous range of the sorted keys
+    # completions are stored both as is and with the opening < prepended
+    def __init__(self, completions):
+        entries = sorted((key.lower(), key, completion) for (key, completion) in completions)
+
+        self.keys = [key for (key, name, completion) in entries]
+        self.names = [name for (key, name, completion) in entries]
+        self.completions = tuple(completion for (key, name, completion) in entries)
+        self.bracketed = tuple((trigger, '<' + contents) for (trigger, contents) in self.completions)
+
+    # Returns the sorted completions as plain values, for marshal
+    def snapshot(self):
+        return (self.keys, self.names, self.completions, self.bracketed)
+
+    # Returns the sorted completions of a snapshot, without sorting again
+    @classmethod
+    def restore(cls, snapshot):
+        self = cls.__new__(cls)
+        self.keys, self.names, self.completions, self.bracketed = snapshot
+        return self
+
+    # Returns completions of all keys starting with prefix
+    # a bisect and a slice, cheap enough to repeat on every keystroke
+    def lookup(self, prefix, bracketed=False):
+        key = prefix.lower()
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + PREFIX_END, lo)
+        completions = self.bracketed if bracketed else self.completions
+        return completions[lo:hi]
+
+class TagIndex(object):
+
+    # Constructor
+    # Indexes (tag, completion) pairs by the whole tag name and by
+    # namespace -> local name, e.g. ui -> inputText for ui:inputText
+    def __init__(self, completions):
+        completions = list(completions)
+        self.tags = SortedCompletions(completions)
+        self.fuzzy = FuzzyIndex(self.tags.names)
+
+        by_namespace = {}
+        for tag, completion in completions:
+            namespace, _, name = tag.lower().partition(':')
+            by_namespace.setdefault(namespace, []).append((name, completion))
+
+        self.namespaces = dict(
+            (namespace, SortedCompletions(entries))
+            for namespace, entries in by_namespace.items())
+
+    # Returns the index as plain values, for marshal
+    def snapshot(self):
+        return (self.tags.snapshot(), self.fuzzy.snapshot(), dict(
+            (namespace, namespace_tags.snapshot())
+            for namespace, namespace_tags in self.namespaces.items()))
+
+    # Returns the index of a snapshot, without building it again
+    @classmethod
+    def restore(cls, snapshot):
+        tags, fuzzy, namespaces = snapshot
+        self = cls.__new__(cls)
+        self.tags = SortedCompletions.restore(tags)
+        self.fuzzy = FuzzyIndex.restore(fuzzy)
+        self.namespaces = dict(
+            (namespace, SortedCompletions.restore(namespace_tags))
+            for namespace, namespace_tags in namespaces.items())
+        return self
+
+    # Returns completions of all tags starting with prefix, with the opening <
+    # prepended when bracketed is set
+    # once the colon is typed only the tags of that namespace are searched
+    def lookup(self, prefix, bracketed=False):
+        namespace, colon, name = prefix.lower().partition(':')
+        if not colon:
+            return self.tags.lookup(namespace, bracketed)
+
+        namespace_tags = self.namespaces.get(namespace)
+        if namespace_tags is None:
+            return ()
+
+        return namespace_tags.lookup(name, bracketed)
+
+    # Returns completions of the tags matching prefix as an abbreviation,
+    # e.g. lfdt for lightning:formattedDateTime, best match first, at most
+    # limit of them unless the rest is kept, see FuzzyIndex.search
+    def search(self, prefix, bracketed=False, limit=None, keep_rest=False):
+        if len(prefix) < FUZZY_MIN_LENGTH:
+            return ()
+
+        completions = self.tags.bracketed if bracketed else self.tags.completions
+        return tuple(completions[i] for i in self.fuzzy.search(prefix, limit, keep_rest))
+
+# Returns the key of the index of completions added to the catalog with the digest
+def index_key(catalog_digest, completions):
+    return hashlib.sha1(catalog_digest.encode('ascii') + marshal.dumps(completions)).hexdigest()
+
+# Reads the index snapshot at path, or returns None when
+# it is missing, unreadable or was saved under another key
+def load_index(path, key):
+    snapshot = read_cache(path, SNAPSHOT_VERSION)
+    if snapshot is None or snapshot.get('key') != key:
+        return None
+
+    return TagIndex.restore(snapshot['index'])
+
+# Writes the index snapshot to path under key, replacing the previous file at once
+# returns whether it was written
+def save_index(index, path, key):
+    return write_cache(path, SNAPSHOT_VERSION, {
+        'key': key,
+        'index': index.snapshot()
+    })
@@ -0,0 +1,147 @@
+import string
+
+# Characters ending a tag or attribute name
+WHITESPACE = frozenset(' \t\r\n')
+NAME_DELIMITERS = frozenset(' \t\r\n=/<>"\'')
+QUOTES = frozenset('"\'')
+# Characters of a completion prefix, tag names include the namespace colon
+WORD_CHARS = frozenset(string.ascii_letters + string.digits + '_:')
+
+# Tokenizes the contents of a tag in a single forward pass
+# text starts right after the opening < and cursor is the offset of the caret in text
+# returns (tag, names of the attributes already present, whether the tag is closed by >)
+# the attribute being typed at the cursor does not count as present
+# tag is None when the tag is closed before the cursor, which is then outside of it
+def scan_tag(text, cursor):
+    n = len(text)
+    i = 0
+    while i < n and text[i] not in NAME_DELIMITERS:
+        i += 1
+
+    tag = text[0:i]
+    names = set()
+
+    while i < n:
+        c = text[i]
+        if c == '>':
+            if i < cursor:
+                return (None, names, True)
+            return (tag, names, True)
+        elif c == '<':
+            # found another open tag
+            break
+        elif c in QUOTES:
+            # skip the quoted value, a missing closing quote ends the scan
+            end = text.find(c, i + 1)
+            if end < 0:
+                break
+            i = end + 1
+        elif c in NAME_DELIMITERS:
+            i += 1
+        else:
+            start = i
+            while i < n and text[i] not in NAME_DELIMITERS:
+                i += 1
+            if not start < cursor <= i:
+                names.add(text[start:i])
+
+    return (tag, names, False)
+
+# Size of the chunks read from the buffer while looking for the tag boundaries
+CHUNK_SIZE = 256
+# Size of the chunks read from the buffer while looking for the start of a prefix
+PREFIX_CHUNK_SIZE = 32
+# Largest gap between the chunks of two cursors which are still read at once
+PREFIX_MERGE_GAP = 256
+
+# Reads backwards from pt in chunks until the first <
+# read(a, b) returns the text of the buffer between a and b
+# returns the text from the last < up to pt, or None without one
+# a > in between may be part of a quoted value, scan_tag tells whether it closes the tag
+def read_tag_head(read, pt):
+    chunks = []
+    end = pt
+    while end > 0:
+        start = max(0, end - CHUNK_SIZE)
+        chunk = read(start, end)
+        i = chunk.rfind('<')
+        if i >= 0:
+            chunks.append(chunk[i:])
+            return ''.join(reversed(chunks))
+        chunks.append(chunk)
+        end = start
+
+    return None
+
+# Reads forwards from pt in chunks until the first <
+# returns the text from pt up to and including that character,
+# or up to the end of the buffer
+# the > closing the tag is in there, unless it is missing, scan_tag finds it
+def read_tag_tail(read, pt):
+    chunks = []
+    start = pt
+    while True:
+        chunk = read(start, start + CHUNK_SIZE)
+        i = chunk.find('<')
+        if i >= 0:
+            chunks.append(chunk[0:i + 1])
+            break
+        chunks.append(chunk)
+        if len(chunk) < CHUNK_SIZE:
+            break
+        start += CHUNK_SIZE
+
+    return ''.join(chunks)
+
+# Reads backwards from pt over word characters
+# returns the prefix ending at pt, reading only as much text as it spans
+def read_prefix(read, pt):
+    chunks = []
+    end = pt
+    while end > 0:
+        start = max(0, end - PREFIX_CHUNK_SIZE)
+        chunk = read(start, end)
+        i = len(chunk)
+        while i > 0 and chunk[i - 1] in WORD_CHARS:
+            i -= 1
+        chunks.append(chunk[i:])
+        if i > 0:
+            break
+        end = start
+
+    return ''.join(reversed(chunks))
+
+# Reads the prefixes ending at each of the points
+# the chunks before nearby points are merged, so many cursors cost a few reads
+# returns the prefix when all points share it, otherwise an empty string
+def read_common_prefix(read, points):
+    points = sorted(points)
+    prefix = None
+    i = 0
+    while i < len(points):
+        # merge the chunks of the following points while they are close enough
+        j = i
+        while j + 1 < len(points) and points[j + 1] - PREFIX_CHUNK_SIZE - points[j] <= PREFIX_MERGE_GAP:
+            j += 1
+
+        start = max(0, points[i] - PREFIX_CHUNK_SIZE)
+        text = read(start, points[j])
+
+        for pt in points[i:j + 1]:
+            end = pt - start
+            k = end
+            while k > 0 and text[k - 1] in WORD_CHARS:
+                k -= 1
+
+            word = text[k:end]
+            if k == 0 and start > 0:
+                # the prefix continues before the text read
+                word = read_prefix(read, start) + word
+
+            if not word or (prefix is not None and word != prefix):
+                return ''
+            prefix = word
+
+        i = j + 1
+
+    return prefix or ''
@@ -0,0 +1,58 @@
+import functools
+
+# Number of scope names whose classification is kept in memory
+SCOPE_CACHE_SIZE = 512
+
+# Where completions are offered
+COMPLETION_SELECTOR = 'text.html - source - string.quoted, text.xml - source - string.quoted'
+# Where the completions are attribute completions
+TAG_SELECTOR = ('text.html meta.tag - text.html punctuation.definition.tag.begin, '
+    'text.xml meta.tag - text.html punctuation.definition.tag.begin')
+
+# Returns whether the scope name atom, e.g. meta.tag.other.html,
+# is matched by the selector atom, e.g. meta.tag
+def match_atom(selector_atom, atom):
+    return atom == selector_atom or atom.startswith(selector_atom + '.')
+
+# Returns whether the selector atoms are found in order among the scope atoms
+def match_path(path, atoms):
+    i = 0
+    for atom in atoms:
+        if i < len(path) and match_atom(path[i], atom):
+            i += 1
+    return i == len(path)
+
+# Parses a selector made of comma separated "path - excluded path ..." parts
+# returns a list of (path, excluded paths) where a path is a tuple of atoms
+def compile_selector(selector):
+    parts = []
+    for part in selector.split(','):
+        paths = [tuple(path.split()) for path in part.split(' - ')]
+        parts.append((paths[0], paths[1:]))
+    return parts
+
+# Returns whether the compiled selector matches the scope atoms, like view.match_selector
+def match_selector(parts, atoms):
+    return any(match_path(path, atoms) and not any(match_path(excluded, atoms) for excluded in excluded_paths)
+        for (path, excluded_paths) in parts)
+
+COMPLETION_PARTS = compile_selector(COMPLETION_SELECTOR)
+TAG_PARTS = compile_selector(TAG_SELECTOR)
+
+# Classifies the scope name at the cursor
+# returns (whether completions are offered, whether the cursor is inside a tag)
+@functools.lru_cache(maxsize=SCOPE_CACHE_SIZE)
+def classify_scope(scope):
+    atoms = scope.split()
+    if not match_selector(COMPLETION_PARTS, atoms):
+        return (False, False)
+    return (True, match_selector(TAG_PARTS, atoms))
+
+# Returns whether no scope of a view could be offered completions, given the
+# scope name of any point in it, whose first atom is the syntax's base scope
+def never_completes(scope):
+    base = scope.split()[:1]
+    if not base or not base[0].startswith(('text.', 'embedding.')):
+        return True
+    return any(match_path(excluded, base)
+        for (path, excluded_paths) in COMPLETION_PARTS for excluded in excluded_paths)
@@ -0,0 +1,24 @@
+# Snippets inserted by the completions, rendered when the catalog is built
+# and at runtime for the custom components of the workspace
+
+def make_completion(tag, required_attributes):
+    def inc():
+        for i in range(1,100):
+            yield i
+
+    i = inc()
+    required_attributes = [
+        '{}="${{{}:{}}}"'.format(attribute, next(i), type) 
+        for (attribute, type) in required_attributes];
+
+    return (tag + '\tTag', tag +' ' + ' '.join(required_attributes)+ ' ${} >${}</'.format(next(i), next(i)) + tag + '>')
+
+# Returns the attribute completion, the closing suffix of the tag is
+# appended to its contents when completing
+def make_attribute_completion(name, type):
+    # ("class\tAttr", "class="$1">"),
+    return (name + '\t' + type, name + '="${1:'+ type +'}" $2')
+
+# Returns [(name, type)] of the required attributes in {name: traits}
+def required_attributes(attributes):
+    return [(name, traits['type']) for (name, traits) in attributes.items() if traits['required']]
@@ -0,0 +1,137 @@
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds of the histogram buckets in microseconds,
+# the last bucket holds everything slower
+BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+PERCENTILES = (50, 95, 99)
+
+class Histogram(object):
+
+    # Counts of durations per fixed bucket
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+
+    def add(self, us):
+        self.counts[bisect.bisect_left(BUCKETS, us)] += 1
+        self.total += 1
+
+    # Returns the upper bound of the bucket holding the p-th percentile,
+    # or None when it is the unbounded last bucket
+    def percentile(self, p):
+        rank = p / 100.0 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else None
+        return None
+
+class PhaseStats(object):
+
+    # Latency histograms per (file type, phase)
+    # file_type is the one of the last profiled query, for the phases not receiving the view
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.file_type = 'unknown'
+
+    def add(self, file_type, phase, seconds):
+        key = (file_type, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.add(seconds * 1e6)
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {}
+
+    # Returns the percentiles of every phase as a text table
+    def report(self):
+        def bound(us):
+            return '>{}'.format(BUCKETS[-1]) if us is None else '<={}'.format(us)
+
+        lines = ['{:<10} {:<28} {:>8} {:>9} {:>9} {:>9}'.format(
+            'file type', 'phase', 'count', *['p{} us'.format(p) for p in PERCENTILES])]
+        for (file_type, phase), histogram in sorted(self.histograms.items()):
+            lines.append('{:<10} {:<28} {:>8} {:>9} {:>9} {:>9}'.format(
+                file_type, phase, histogram.total,
+                *[bound(histogram.percentile(p)) for p in PERCENTILES]))
+        lines.append('')
+        lines.append('Times of a phase include the phases it calls.')
+        return '\n'.join(lines)
+
+# Returns the file type recorded for view, its file extension
+def file_type(view):
+    name = view.file_name()
+    if not name:
+        return 'untitled'
+    return os.path.splitext(name)[1][1:] or 'none'
+
+class ProfiledView(object):
+
+    # Stands in for a view, timing its substr, scope_name and match_selector calls
+    def __init__(self, view, stats):
+        self.view = view
+        self.stats = stats
+        self.file_type = file_type(view)
+
+    def substr(self, x):
+        start = time.perf_counter()
+        try:
+            return self.view.substr(x)
+        finally:
+            self.stats.add(self.file_type, 'view.substr', time.perf_counter() - start)
+
+    def scope_name(self, pt):
+        start = time.perf_counter()
+        try:
+            return self.view.scope_name(pt)
+        finally:
+            self.stats.add(self.file_type, 'view.scope_name', time.perf_counter() - start)
+
+    def match_selector(self, pt, selector):
+        start = time.perf_counter()
+        try:
+            return self.view.match_selector(pt, selector)
+        finally:
+            self.stats.add(self.file_type, 'view.match_selector', time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.view, name)
+
+# Returns method timed into stats under its name
+# the first argument of method is the view
+def profiled(stats, name, method, wrap_view=False):
+    def timed(view, *args):
+        if wrap_view:
+            view = ProfiledView(view, stats)
+            stats.file_type = view.file_type
+        start = time.perf_counter()
+        try:
+            return method(view, *args)
+        finally:
+            stats.add(getattr(view, 'file_type', 'unknown'), name, time.perf_counter() - start)
+
+    return timed
+
+# Returns method timed into stats under its name, for the methods which
+# do not receive the view, e.g. those of the completion engine
+def profiled_phase(stats, name, method):
+    def timed(*args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            stats.add(stats.file_type, name, time.perf_counter() - start)
+
+    return timed
+
+# Returns the view a ProfiledView stands in for, or view itself
+def unwrap_view(view):
+    return view.view if isinstance(view, ProfiledView) else view
@@ -0,0 +1,72 @@
+import bisect
+import re
+
+class GapOffsets(object):
+
+    # Sorted offsets of one character in the buffer, split at a movable gap
+    # like a gap buffer: offsets before the gap are absolute, offsets after the
+    # gap are stored relative to shift, so an edit only touches the offsets
+    # between the previous edit and this one
+    # after holds the negated relative offsets in ascending order, so the
+    # offsets next to the gap are at its end and both lists can be bisected
+    def __init__(self, offsets):
+        self.before = list(offsets)
+        self.after = []
+        self.shift = 0
+
+    # Moves the gap to pt, after this all offsets < pt are in before
+    def move_gap(self, pt):
+        before, after, shift = self.before, self.after, self.shift
+
+        i = bisect.bisect_left(before, pt)
+        if i < len(before):
+            after.extend([shift - offset for offset in reversed(before[i:])])
+            del before[i:]
+            return
+
+        j = bisect.bisect_right(after, shift - pt)
+        if j < len(after):
+            before.extend([shift - offset for offset in reversed(after[j:])])
+            del after[j:]
+
+    # Replaces the old region [a, b) with new offsets (all in [a, a + length))
+    def replace(self, a, b, length, offsets):
+        self.move_gap(a)
+        del self.after[bisect.bisect_right(self.after, self.shift - b):]
+        self.before.extend(offsets)
+        self.shift += length - (b - a)
+
+    # Returns the last offset < pt or -1
+    def last_before(self, pt):
+        self.move_gap(pt)
+        return self.before[-1] if self.before else -1
+
+class TagTracker(object):
+
+    # Constructor
+    # Tracks the offsets of every < in the text of a buffer
+    # a > may be part of a quoted value, so where a tag ends is left to scan_tag
+    def __init__(self, text):
+        self.rebuild(text)
+
+    def rebuild(self, text):
+        self.opens = GapOffsets(m.start() for m in re.finditer('<', text))
+        self.size = len(text)
+
+    # Forces a rebuild on next use
+    def invalidate(self):
+        self.size = -1
+
+    # Applies an edit, the old region [a, b) was replaced with text
+    def replace(self, a, b, text):
+        self.opens.replace(a, b, len(text), [a + m.start() for m in re.finditer('<', text)])
+        self.size += len(text) - (b - a)
+
+    # Returns the offset of the last < before pt, which opens the tag
+    # containing pt if any, or None without one
+    def tag_start(self, pt):
+        start = self.opens.last_before(pt)
+        if start < 0:
+            return None
+
+        return start
@@ -0,0 +1,70 @@
+import heapq
+import math
+import time
+from LightningComponentsCompletions.aura_cache import read_cache, write_cache
+
+# Time in seconds after which a usage counts half
+HALF_LIFE = 14 * 24 * 3600
+# Version of the usage file, bumped whenever the counts change shape
+USAGE_VERSION = 1
+
+class UsageCounts(object):
+
+    # Constructor
+    # Keeps a decaying count of the accepted completions,
+    # key -> (count, time of the count)
+    # keys are tags, or (tag, attribute) for attributes
+    def __init__(self):
+        self.counts = {}
+        self.changed = False
+
+    # Counts one use of key
+    def add(self, key, now=None):
+        now = time.time() if now is None else now
+        self.counts[key] = (self.score(key, now) + 1, now)
+        self.changed = True
+
+    # Returns the count of key, decayed to now
+    def score(self, key, now=None):
+        entry = self.counts.get(key)
+        if entry is None:
+            return 0
+
+        count, then = entry
+        now = time.time() if now is None else now
+        return count * math.pow(0.5, (now - then) / HALF_LIFE)
+
+    # Loads the counts saved by save, returns False when there are none
+    def load(self, path):
+        usage = read_cache(path, USAGE_VERSION)
+        if usage is None:
+            return False
+
+        self.counts = usage['counts']
+        return True
+
+    # Writes the counts to path, replacing the previous file at once
+    # returns whether they were written, they are kept as changed otherwise
+    def save(self, path):
+        if not write_cache(path, USAGE_VERSION, {'counts': self.counts}):
+            return False
+
+        self.changed = False
+        return True
+
+# Returns the k items with the highest score(item) in descending order,
+# items scoring the same keep their order
+# with keep_rest the other items follow in their order, so none is dropped
+# items is returned as is when it is already short and nothing has a score
+def top_k(items, score, k, keep_rest=False):
+    scores = [score(item) for item in items]
+    if (len(items) <= k or keep_rest) and not any(scores):
+        return items
+
+    best = heapq.nlargest(k, range(len(items)), key=scores.__getitem__)
+    if not keep_rest:
+        return tuple(items[i] for i in best)
+
+    best_set = set(best)
+    return tuple([items[i] for i in best] +
+        [item for (i, item) in enumerate(items) if i not in best_set])
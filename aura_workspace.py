@@ -0,0 +1,165 @@
+import hashlib
+import os
+import re
+import threading
+from LightningComponentsCompletions.aura_cache import read_cache, write_cache
+
+# Namespace of the components defined in the workspace
+CUSTOM_NAMESPACE = 'c'
+# Folders never containing Aura bundles
+IGNORED_FOLDERS = frozenset(['.git', '.svn', '.hg', 'node_modules', '.sfdx', '.sf'])
+# Version of the index cache file, bumped whenever the entries change shape
+CACHE_VERSION = 1
+
+ATTRIBUTE_TAG = re.compile(r'<aura:attribute\b([^>]*)>', re.IGNORECASE)
+TAG_ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Returns the <aura:attribute> definitions of a component's markup
+# as {name: {'type': type, 'required': bool}}, like aura_catalog.Catalog.get
+def parse_component(text):
+    attributes = {}
+    for tag in ATTRIBUTE_TAG.finditer(text):
+        values = dict(
+            (m.group(1).lower(), m.group(2) if m.group(2) is not None else m.group(3))
+            for m in TAG_ATTRIBUTE.finditer(tag.group(1)))
+
+        name = values.get('name')
+        if name:
+            attributes[name] = {
+                'type': values.get('type') or 'String',
+                'required': values.get('required', '').strip().lower() == 'true'
+            }
+
+    return attributes
+
+# Returns the tag of the component defined by the .cmp file at path
+def component_tag(path):
+    return CUSTOM_NAMESPACE + ':' + os.path.splitext(os.path.basename(path))[0]
+
+# Reads the component at path, returns the entry (mtime, size, hash, tag, attributes)
+# or None when it can not be read
+# entry is the previous entry of path, reused when mtime and size or the
+# content hash show the file did not change
+def read_component(path, entry=None):
+    try:
+        stat = os.stat(path)
+        if entry is not None and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+    except (IOError, OSError):
+        return None
+
+    digest = hashlib.sha1(data).hexdigest()
+    if entry is not None and entry[2] == digest:
+        return (stat.st_mtime, stat.st_size) + entry[2:]
+
+    return (stat.st_mtime, stat.st_size, digest,
+        component_tag(path), parse_component(data.decode('utf-8', 'replace')))
+
+# Yields the paths of all .cmp files under folders
+def find_components(folders):
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if d not in IGNORED_FOLDERS]
+            for name in files:
+                if name.endswith('.cmp'):
+                    yield os.path.join(root, name)
+
+class WorkspaceIndex(object):
+
+    # Constructor
+    # Keeps the components found in the project folders,
+    # path -> (mtime, size, hash, tag, attributes)
+    def __init__(self):
+        self.folders = ()
+        self.components = {}
+        # number of the current components, increased by every change
+        self.version = 0
+        # serializes the updates, readers use whichever components they see
+        self.lock = threading.Lock()
+
+    # Indexes all components under folders, reading them on executor
+    # only the components which changed since the last index are parsed again
+    # the result replaces the index at once when done
+    def index_folders(self, folders, executor):
+        paths = list(find_components(folders))
+        previous = [self.components.get(path) for path in paths]
+        components = {}
+        for path, entry in zip(paths, executor.map(read_component, paths, previous)):
+            if entry is not None:
+                components[path] = entry
+
+        with self.lock:
+            self.folders = tuple(folders)
+            self.components = components
+            self.version += 1
+
+    # Reads the component at path again, returns whether its entry changed
+    def update_component(self, path):
+        with self.lock:
+            previous = self.components.get(path)
+            entry = read_component(path, previous)
+            if entry == previous:
+                return False
+
+            components = dict(self.components)
+            if entry is None:
+                del components[path]
+            else:
+                components[path] = entry
+            self.components = components
+            self.version += 1
+            return True
+
+    # Lists the components under the folders again, dropping the ones whose
+    # files no longer exist and reading the new ones, e.g. after files were
+    # created, deleted or renamed, returns whether any was dropped or added
+    def prune(self):
+        paths = set(find_components(self.folders))
+        with self.lock:
+            components = dict(
+                (path, entry) for (path, entry) in self.components.items()
+                if path in paths or os.path.isfile(path))
+            for path in paths:
+                if path not in components:
+                    entry = read_component(path)
+                    if entry is not None:
+                        components[path] = entry
+
+            if components.keys() == self.components.keys():
+                return False
+
+            self.components = components
+            self.version += 1
+            return True
+
+    # Returns (version, {tag: attributes}) of the indexed components, the
+    # version tells which of two results is the newer one
+    def tags(self):
+        with self.lock:
+            version, components = self.version, self.components
+        return (version, dict(entry[3:5] for entry in components.values()))
+
+    # Loads the index saved by save, returns False when there is none
+    def load(self, path):
+        cache = read_cache(path, CACHE_VERSION)
+        if cache is None:
+            return False
+
+        with self.lock:
+            self.folders = tuple(cache['folders'])
+            self.components = cache['components']
+            self.version += 1
+        return True
+
+    # Writes the index to path, replacing the previous file at once
+    # returns whether it was written
+    # the lock keeps the folders and components of one index together
+    def save(self, path):
+        with self.lock:
+            return write_cache(path, CACHE_VERSION, {
+                'folders': self.folders,
+                'components': self.components
+            })
@@ -0,0 +1,167 @@
+# Headless benchmarks of the completion hot path
+# runs the plugin against the stand-in sublime module of this folder and
+# reports per keystroke latency and allocations of each operation
+# usage: python bench/run.py [--lines 5000] [--cursors 50] [--corpus bench/corpus]
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+package = types.ModuleType('LightningComponentsCompletions')
+package.__path__ = [PACKAGE_DIR]
+sys.modules['LightningComponentsCompletions'] = package
+
+import sublime
+from LightningComponentsCompletions.aura_completions import LightningComponentsCompletions, view_reader
+from LightningComponentsCompletions.aura_engine import text_reader
+
+PERCENTILES = (50, 95, 99)
+TAG_START = re.compile(r'<([\w:]+)')
+ATTRIBUTE_START = re.compile(r'\s([\w:-]+)=')
+
+# Returns the keystrokes typing the markup of text: (pt, is_inside_tag) at every
+# character of the tag names and after every character of the attribute names
+def keystrokes(text):
+    strokes = []
+    for m in TAG_START.finditer(text):
+        for pt in range(m.start(1) + 1, m.end(1) + 1):
+            strokes.append((pt, False))
+    for m in ATTRIBUTE_START.finditer(text):
+        if 'meta.tag' in sublime.View(text).scope_name(m.start(1)):
+            for pt in range(m.start(1), m.end(1) + 1):
+                strokes.append((pt, True))
+    return strokes
+
+# Generates lines of nested markup using the tags and attributes of the catalog
+def synthetic_markup(listener, lines, seed=1):
+    rand = random.Random(seed)
+    catalog = listener.engine.tag_to_attributes
+    tags = sorted(catalog.tags())
+    out = ['<aura:component>']
+    depth = 1
+    while len(out) < lines:
+        if depth > 1 and rand.random() < 0.3:
+            depth -= 1
+            out.append('    ' * depth + '</div>')
+            continue
+
+        tag = rand.choice(tags)
+        names = sorted(catalog.get(tag))
+        attributes = ' '.join(
+            '{}="{{!v.{}}}"'.format(name, name)
+            for name in rand.sample(names, min(len(names), rand.randint(0, 6))))
+        out.append('    ' * depth + '<{} {}/>'.format(tag, attributes))
+        if rand.random() < 0.2:
+            out.append('    ' * depth + '<div class="slds-grid">')
+            depth += 1
+
+    out.append('</aura:component>')
+    return '\n'.join(out)
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+# Runs operation(view, pt, is_inside_tag) for each keystroke
+# returns ([latency in us], [peak allocated bytes], substr calls per keystroke)
+def measure(view, strokes, operation):
+    latencies = []
+    for pt, is_inside_tag in strokes:
+        view.selection = [sublime.Region(pt)]
+        start = time.perf_counter()
+        operation(view, pt, is_inside_tag)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        sublime.run_pending()
+
+    view.substr_calls = 0
+    peaks = []
+    tracemalloc.start()
+    for pt, is_inside_tag in strokes:
+        view.selection = [sublime.Region(pt)]
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        operation(view, pt, is_inside_tag)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        sublime.run_pending()
+    tracemalloc.stop()
+
+    return (latencies, peaks, view.substr_calls / float(len(strokes)))
+
+def operations(listener, cursors):
+    engine = listener.engine
+
+    def column(view, pt):
+        # the same column on the following lines, like a column selection
+        col = pt - view.line(pt).a
+        locations = [pt]
+        line_end = view.line(pt).b
+        while len(locations) < cursors and line_end < view.size():
+            line = view.line(line_end + 1)
+            locations.append(min(line.a + col, line.b))
+            line_end = line.b
+        return locations
+
+    return [
+        ('on_query_completions', lambda view, pt, inside:
+            listener.on_query_completions(view, '', [pt])),
+        ('expand_prefix', lambda view, pt, inside:
+            engine.expand_prefix(view_reader(view), [pt])),
+        ('expand_prefix x{}'.format(cursors), lambda view, pt, inside:
+            engine.expand_prefix(view_reader(view), column(view, pt))),
+        ('get_completions', lambda view, pt, inside:
+            listener.get_completions(view, '', [pt], inside)),
+        ('get_attribute_completions', lambda view, pt, inside:
+            inside and engine.get_attribute_completions(view_reader(view), pt,
+                engine.expand_prefix(view_reader(view), [pt]))),
+        # the engine alone, reading the text without a view
+        ('engine.get_completions', lambda view, pt, inside:
+            engine.get_completions(text_reader(view.text), [pt], inside)),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', default=os.path.join(BENCH_DIR, 'corpus'),
+        help='folder of .cmp files, also indexed as the workspace')
+    parser.add_argument('--lines', type=int, default=5000, help='lines of the synthetic file')
+    parser.add_argument('--cursors', type=int, default=50, help='cursors of the multi cursor case')
+    parser.add_argument('--keystrokes', type=int, default=2000, help='keystrokes sampled per file')
+    args = parser.parse_args()
+
+    sublime.folders[:] = [args.corpus]
+    listener = LightningComponentsCompletions()
+    # indexed here rather than on the executor, which index_workspace itself uses
+    listener.index_workspace(tuple(sublime.folders))
+    sublime.run_pending()
+    print('{} custom components indexed'.format(len(listener.engine.custom_tag_to_attributes)))
+
+    files = [(os.path.basename(path), open(path, encoding='utf-8').read())
+        for path in sorted(glob.glob(os.path.join(args.corpus, '*.cmp')))]
+    files.append(('synthetic {} lines'.format(args.lines), synthetic_markup(listener, args.lines)))
+
+    print('{:<24} {:<28} {:>7} {:>9} {:>9} {:>9} {:>7} {:>9}'.format(
+        'file', 'operation', 'keys', 'p50 us', 'p95 us', 'p99 us', 'substr', 'p95 B'))
+
+    rand = random.Random(2)
+    for name, text in files:
+        strokes = keystrokes(text)
+        if len(strokes) > args.keystrokes:
+            strokes = rand.sample(strokes, args.keystrokes)
+
+        for operation_name, operation in operations(listener, args.cursors):
+            view = sublime.View(text)
+            latencies, peaks, substr_calls = measure(view, strokes, operation)
+            print('{:<24} {:<28} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>7.1f} {:>9}'.format(
+                name[:24], operation_name, len(strokes),
+                *([percentile(latencies, p) for p in PERCENTILES] + [substr_calls, percentile(peaks, 95)])))
+
+if __name__ == '__main__':
+    main()
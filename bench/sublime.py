@@ -0,0 +1,150 @@
+# In-memory stand-in for the sublime module, used by the benchmarks to run
+# the plugin outside the editor
+# only the parts of the API used by the plugin are provided
+import atexit
+import os
+import shutil
+import tempfile
+
+INHIBIT_WORD_COMPLETIONS = 8
+INHIBIT_EXPLICIT_COMPLETIONS = 16
+
+# callbacks scheduled with set_timeout, run by run_pending
+pending = []
+# folders returned by the windows' folders()
+folders = []
+
+def set_timeout(callback, delay=0):
+    pending.append(callback)
+
+def set_timeout_async(callback, delay=0):
+    pending.append(callback)
+
+# Runs the scheduled callbacks, like the editor does between keystrokes
+def run_pending():
+    while pending:
+        pending.pop(0)()
+
+# removed when the benchmarks exit
+CACHE_PATH = tempfile.mkdtemp(prefix='lightning-bench-')
+atexit.register(shutil.rmtree, CACHE_PATH, True)
+
+def cache_path():
+    return CACHE_PATH
+
+def packages_path():
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def load_binary_resource(name):
+    with open(os.path.join(packages_path(), name[len('Packages/'):]), 'rb') as f:
+        return f.read()
+
+class Window(object):
+
+    def folders(self):
+        return list(folders)
+
+def windows():
+    return [Window()]
+
+class Region(object):
+
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def empty(self):
+        return self.a == self.b
+
+class Settings(dict):
+
+    def set(self, key, value):
+        self[key] = value
+
+    def erase(self, key):
+        self.pop(key, None)
+
+class View(object):
+
+    next_id = 1
+
+    # Constructor
+    # text is the whole buffer, the cursor starts at its end
+    def __init__(self, text, file_name=None):
+        self.text = text
+        self.path = file_name
+        self.view_id = View.next_id
+        View.next_id += 1
+        self.selection = [Region(len(text))]
+        self.view_settings = Settings()
+        # number of substr calls, i.e. round trips to the editor
+        self.substr_calls = 0
+
+    def id(self):
+        return self.view_id
+
+    def buffer_id(self):
+        return self.view_id
+
+    def is_valid(self):
+        return True
+
+    def file_name(self):
+        return self.path
+
+    def window(self):
+        return Window()
+
+    def settings(self):
+        return self.view_settings
+
+    def size(self):
+        return len(self.text)
+
+    def sel(self):
+        return self.selection
+
+    def substr(self, x):
+        self.substr_calls += 1
+        if isinstance(x, int):
+            return self.text[x:x + 1]
+        return self.text[max(0, x.begin()):x.end()]
+
+    def line(self, x):
+        pt = x if isinstance(x, int) else x.begin()
+        a = self.text.rfind('\n', 0, pt) + 1
+        b = self.text.find('\n', pt)
+        return Region(a, len(self.text) if b < 0 else b)
+
+    # Returns a scope name good enough for the selectors of the plugin:
+    # text.html, plus meta.tag inside a tag and string.quoted inside its values
+    def scope_name(self, pt):
+        scope = 'text.html.basic '
+        start = self.text.rfind('<', 0, pt)
+        if start >= 0 and self.text.rfind('>', 0, pt) < start:
+            scope += 'meta.tag.other.html '
+            if self.text.count('"', start, pt) % 2:
+                scope += 'string.quoted.double.html '
+        return scope
+
+    # Matches the selectors of the plugin, "a b - c - d" style only
+    def match_selector(self, pt, selector):
+        scopes = self.scope_name(pt).split()
+        included, *excluded = [part.split() for part in selector.split(' - ')]
+
+        def matches(names):
+            return all(any(scope.startswith(name) for scope in scopes) for name in names)
+
+        return matches(included) and not any(matches(names) for names in excluded)
+
+    # Replaces the selection with text, like typing it
+    def insert(self, text):
+        pt = self.selection[0].b
+        self.text = self.text[:pt] + text + self.text[pt:]
+        self.selection = [Region(pt + len(text))]
@@ -0,0 +1,21 @@
+# In-memory stand-in for the sublime_plugin module, see sublime.py
+# TextChangeListener is left out, so the plugin follows edits like on
+# Sublime Text 3
+
+class EventListener(object):
+    pass
+
+class ViewEventListener(object):
+
+    def __init__(self, view):
+        self.view = view
+
+class TextCommand(object):
+
+    def __init__(self, view):
+        self.view = view
+
+class WindowCommand(object):
+
+    def __init__(self, window):
+        self.window = window
@@ -0,0 +1,21 @@
+# Builds aura_tags.bin, the catalog loaded by the plugin, from aura_tags.py
+# the tag and attribute snippets are rendered into it
+# usage: python catalog/build.py
+import os
+import sys
+import types
+
+CATALOG_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, CATALOG_DIR)
+
+# the package modules import each other by the package name
+package = types.ModuleType('LightningComponentsCompletions')
+package.__path__ = [os.path.dirname(CATALOG_DIR)]
+sys.modules['LightningComponentsCompletions'] = package
+
+from LightningComponentsCompletions.aura_catalog import build_catalog
+from aura_tags import tag_dict
+
+if __name__ == '__main__':
+    with open(os.path.join(CATALOG_DIR, 'aura_tags.bin'), 'wb') as f:
+        f.write(build_catalog(tag_dict))